@@ -1,5 +1,11 @@
+import functools
 import json
 
+try:
+    import orjson
+except ImportError:  # orjson es opcional; se usa json de la stdlib.
+    orjson = None
+
 CUES_OUTPUT_SCHEMA = {
     "type": "object",
     "additionalProperties": False,
@@ -19,5 +25,8 @@ CUES_RESPONSE_JSON_SCHEMA = {
 }
 
 
+@functools.lru_cache(maxsize=1)
 def cues_output_schema_pretty_json() -> str:
+    if orjson is not None:
+        return orjson.dumps(CUES_OUTPUT_SCHEMA, option=orjson.OPT_INDENT_2).decode("utf-8")
     return json.dumps(CUES_OUTPUT_SCHEMA, ensure_ascii=False, indent=2)
@@ -1,6 +1,8 @@
 import argparse
+import os
 import re
 import sys
+from operator import itemgetter
 from pathlib import Path
 
 from youtube_transcript_api import NoTranscriptFound
@@ -10,26 +12,24 @@ from youtube_transcript_api import YouTubeTranscriptApi
 from youtube_transcript_api.formatters import TextFormatter
 
 
-VIDEO_ID_REGEX = re.compile(r"^[a-zA-Z0-9_-]{11}$")
+# Tablas de minutos/segundos/milisegundos ya formateados (hh puede pasar de 99).
+_TWO_DIGITS = tuple(f"{i:02}" for i in range(100))
+_THREE_DIGITS = tuple(f"{i:03}" for i in range(1000))
+_ID_ALLOWED = frozenset("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_-")
+_URL_ID_RE = re.compile(
+    r"(?:v=|youtu\.be/|youtube\.com/(?:live|shorts|embed)/)([a-zA-Z0-9_-]{11})"
+)
 
 
 def extract_video_id(value: str) -> str:
     """Return a YouTube video id from a raw id or common YouTube URL formats."""
     value = value.strip()
-    if VIDEO_ID_REGEX.fullmatch(value):
+    if len(value) == 11 and _ID_ALLOWED.issuperset(value):
         return value
 
-    patterns = [
-        r"(?:v=)([a-zA-Z0-9_-]{11})",
-        r"(?:youtu\.be/)([a-zA-Z0-9_-]{11})",
-        r"(?:youtube\.com/live/)([a-zA-Z0-9_-]{11})",
-        r"(?:youtube\.com/shorts/)([a-zA-Z0-9_-]{11})",
-        r"(?:youtube\.com/embed/)([a-zA-Z0-9_-]{11})",
-    ]
-    for pattern in patterns:
-        match = re.search(pattern, value)
-        if match:
-            return match.group(1)
+    match = _URL_ID_RE.search(value)
+    if match:
+        return match.group(1)
 
     raise ValueError(
         "No pude extraer un video_id valido. Pasa un ID de 11 caracteres o una URL de YouTube."
@@ -51,20 +51,17 @@ def fetch_transcript(video_id: str, languages: list[str]):
 
 
 def _fmt_seconds(seconds: float) -> str:
-    milliseconds = int(round(seconds * 1000))
-    hh = milliseconds // 3_600_000
-    mm = (milliseconds % 3_600_000) // 60_000
-    ss = (milliseconds % 60_000) // 1000
-    ms = milliseconds % 1000
-    return f"{hh:02}:{mm:02}:{ss:02}.{ms:03}"
+    # Los tiempos nunca son negativos: sumar 0.5 equivale a redondear.
+    total_seconds, ms = divmod(int(seconds * 1000 + 0.5), 1000)
+    total_minutes, ss = divmod(total_seconds, 60)
+    hh, mm = divmod(total_minutes, 60)
+    return f"{hh:02}:{_TWO_DIGITS[mm]}:{_TWO_DIGITS[ss]}.{_THREE_DIGITS[ms]}"
 
 
 def _fmt_hms(seconds: float) -> str:
-    total_seconds = int(seconds)
-    hh = total_seconds // 3600
-    mm = (total_seconds % 3600) // 60
-    ss = total_seconds % 60
-    return f"{hh:02}:{mm:02}:{ss:02}"
+    total_minutes, ss = divmod(int(seconds), 60)
+    hh, mm = divmod(total_minutes, 60)
+    return f"{hh:02}:{_TWO_DIGITS[mm]}:{_TWO_DIGITS[ss]}"
 
 
 def format_plain_text(segments) -> str:
@@ -77,47 +74,74 @@ def to_raw_segments(segments):
     return segments
 
 
-def format_with_timestamps(segments) -> str:
-    raw_segments = to_raw_segments(segments)
+def iter_with_timestamps(segments):
+    fmt, to_float, to_str = _fmt_seconds, float, str
+    for segment in to_raw_segments(segments):
+        start = to_float(segment["start"])
+        end = start + to_float(segment.get("duration", 0.0))
+        yield f"[{fmt(start)} --> {fmt(end)}] {to_str(segment['text']).strip()}"
+
 
-    lines: list[str] = []
-    for segment in raw_segments:
-        start = float(segment["start"])
-        duration = float(segment.get("duration", 0.0))
-        end = start + duration
-        text = str(segment["text"]).strip()
-        lines.append(f"[{_fmt_seconds(start)} --> {_fmt_seconds(end)}] {text}")
-    return "\n".join(lines)
+def format_with_timestamps(segments) -> str:
+    return "\n".join(iter_with_timestamps(segments))
 
 
 def _fmt_compact_seconds(seconds: float) -> str:
+    if seconds.is_integer():
+        return str(int(seconds))
     return f"{seconds:.3f}".rstrip("0").rstrip(".")
 
 
+def iter_with_timestamps_compact(segments):
+    fmt, to_float, to_str = _fmt_compact_seconds, float, str
+    for segment in to_raw_segments(segments):
+        start = to_float(segment["start"])
+        end = start + to_float(segment.get("duration", 0.0))
+        text = to_str(segment["text"]).replace("\n", " ").strip()
+        yield f"{fmt(start)}|{fmt(end)}|{text}"
+
+
 def format_with_timestamps_compact(segments) -> str:
-    raw_segments = to_raw_segments(segments)
-
-    lines: list[str] = []
-    for segment in raw_segments:
-        start = float(segment["start"])
-        duration = float(segment.get("duration", 0.0))
-        end = start + duration
-        text = str(segment["text"]).replace("\n", " ").strip()
-        lines.append(
-            f"{_fmt_compact_seconds(start)}|{_fmt_compact_seconds(end)}|{text}"
-        )
-    return "\n".join(lines)
+    return "\n".join(iter_with_timestamps_compact(segments))
+
+
+def iter_with_start_time_only(segments):
+    fmt, to_float, to_str = _fmt_hms, float, str
+    get_start_text = itemgetter("start", "text")
+    for segment in to_raw_segments(segments):
+        start, text = get_start_text(segment)
+        text = to_str(text).replace("\n", " ").strip()
+        yield f"{fmt(to_float(start))}|{text}"
 
 
 def format_with_start_time_only(segments) -> str:
-    raw_segments = to_raw_segments(segments)
+    return "\n".join(iter_with_start_time_only(segments))
+
 
-    lines: list[str] = []
-    for segment in raw_segments:
-        start = float(segment["start"])
-        text = str(segment["text"]).replace("\n", " ").strip()
-        lines.append(f"{_fmt_hms(start)}|{text}")
-    return "\n".join(lines)
+def write_lines(lines, output_file) -> None:
+    """Write lines separated by newlines, same output as "\\n".join(lines)."""
+    lines = iter(lines)
+    first = next(lines, None)
+    if first is None:
+        return
+    output_file.write(first)
+    output_file.writelines(f"\n{line}" for line in lines)
+
+
+def write_output_file(output_path: Path, lines) -> None:
+    """Write lines to a temp file next to output_path and move it into place when done.
+
+    If formatting fails midway, an existing output file is left untouched.
+    """
+    temp_path = output_path.with_name(f".{output_path.name}.tmp")
+    try:
+        # Se escribe linea a linea con un buffer grande en vez de armar todo el texto en memoria.
+        with open(temp_path, "w", encoding="utf-8", buffering=1 << 19) as output_file:
+            write_lines(lines, output_file)
+        os.replace(temp_path, output_path)
+    except BaseException:
+        temp_path.unlink(missing_ok=True)
+        raise
 
 
 def build_output_path(video_id: str, output: str | None) -> Path:
@@ -174,17 +198,17 @@ def main() -> int:
         video_id = extract_video_id(args.video)
         languages = parse_languages(args.languages)
         segments = fetch_transcript(video_id, languages)
+        output_path = build_output_path(video_id, args.output)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
         if args.timestamps_initial:
-            transcript_text = format_with_start_time_only(segments)
+            lines = iter_with_start_time_only(segments)
         elif args.timestamps_compact:
-            transcript_text = format_with_timestamps_compact(segments)
+            lines = iter_with_timestamps_compact(segments)
         elif args.with_timestamps:
-            transcript_text = format_with_timestamps(segments)
+            lines = iter_with_timestamps(segments)
         else:
-            transcript_text = format_plain_text(segments)
-        output_path = build_output_path(video_id, args.output)
-        output_path.parent.mkdir(parents=True, exist_ok=True)
-        output_path.write_text(transcript_text, encoding="utf-8")
+            lines = [format_plain_text(segments)]
+        write_output_file(output_path, lines)
     except ValueError as exc:
         print(f"[ERROR] {exc}", file=sys.stderr)
         return 1
@@ -0,0 +1,34 @@
+import os
+from pathlib import Path
+
+# Rutas .env ya leidas: si un mismo proceso llama varias veces a main(), no se releen.
+_LOADED_ENV_PATHS: set[Path] = set()
+
+
+def load_env_file_if_needed(env_path: Path = Path(".env")) -> None:
+    if not env_path.exists():
+        return
+    resolved_path = env_path.resolve()
+    if resolved_path in _LOADED_ENV_PATHS:
+        return
+
+    needed = {key for key in ("MODEL_NAME", "OPENROUTER_API_KEY") if not os.getenv(key)}
+    if not needed:
+        return
+
+    with env_path.open(encoding="utf-8") as env_file:
+        for line in env_file:
+            if not needed:
+                break
+            stripped = line.strip()
+            if not stripped or stripped.startswith("#"):
+                continue
+            key, sep, value = stripped.partition("=")
+            if not sep:
+                continue
+            key = key.strip()
+            if key in needed:
+                os.environ[key] = value.strip().strip('"').strip("'")
+                needed.discard(key)
+
+    _LOADED_ENV_PATHS.add(resolved_path)
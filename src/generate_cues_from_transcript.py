@@ -1,48 +1,63 @@
 import argparse
+import functools
 import json
 import os
 import sys
 from pathlib import Path
 
-from openai import OpenAI
+from openai import AsyncOpenAI
 
 from cues_schema import CUES_RESPONSE_JSON_SCHEMA
 from cues_schema import cues_output_schema_pretty_json
+from env_loader import load_env_file_if_needed
+from openrouter_client import completion_kwargs
+from openrouter_client import generate_with_retry
+from openrouter_client import generate_with_retry_async
+from openrouter_client import get_client
+from openrouter_client import retry_attempts
+from text_files import link_or_write
+from text_files import write_text_files
+
+try:
+    import orjson
+except ImportError:  # orjson es opcional; se usa json de la stdlib.
+    orjson = None
 
 PROMPT_TEMPLATE_PATH = Path(__file__).resolve().parent.parent / "prompts" / "cues_prompt.md"
 
+_loads = orjson.loads if orjson is not None else json.loads
 
-def load_env_file_if_needed(env_path: Path = Path(".env")) -> None:
-    if not env_path.exists():
-        return
 
-    needed = {"MODEL_NAME", "OPENROUTER_API_KEY"}
-    missing = [key for key in needed if not os.getenv(key)]
-    if not missing:
-        return
-
-    for line in env_path.read_text(encoding="utf-8").splitlines():
-        stripped = line.strip()
-        if not stripped or stripped.startswith("#") or "=" not in stripped:
-            continue
-        key, value = stripped.split("=", 1)
-        key = key.strip()
-        value = value.strip().strip('"').strip("'")
-        if key in needed and not os.getenv(key):
-            os.environ[key] = value
-
-
-def build_prompt(transcript_text: str) -> str:
+@functools.lru_cache(maxsize=1)
+def _load_template() -> str:
     try:
         template = PROMPT_TEMPLATE_PATH.read_text(encoding="utf-8")
     except FileNotFoundError as exc:
         raise ValueError(f"No se encontro el template de prompt: {PROMPT_TEMPLATE_PATH}") from exc
-    return (
-        template.replace("<CUES_JSON_SCHEMA>", cues_output_schema_pretty_json())
-        .replace("<TRANSCRIPCION>", transcript_text)
+    return template.replace("<CUES_JSON_SCHEMA>", cues_output_schema_pretty_json())
+
+
+def build_prompt(transcript_text: str) -> str:
+    return _load_template().replace("<TRANSCRIPCION>", transcript_text)
+
+
+def _completion_kwargs(
+    model_name: str,
+    prompt: str,
+    max_output_tokens: int,
+    reasoning_effort: str,
+) -> dict:
+    return completion_kwargs(
+        model_name, prompt, max_output_tokens, reasoning_effort, CUES_RESPONSE_JSON_SCHEMA
     )
 
 
+def _unpack_response(response) -> tuple[str, str | None]:
+    content = response.choices[0].message.content
+    finish_reason = response.choices[0].finish_reason
+    return (content.strip() if content else "{}"), finish_reason
+
+
 def call_openrouter(
     model_name: str,
     api_key: str,
@@ -50,29 +65,24 @@ def call_openrouter(
     max_output_tokens: int = 3000,
     reasoning_effort: str = "low",
 ) -> tuple[str, str | None]:
-    client = OpenAI(
-        base_url="https://openrouter.ai/api/v1",
-        api_key=api_key,
+    client = get_client(api_key)
+    response = client.chat.completions.create(
+        **_completion_kwargs(model_name, prompt, max_output_tokens, reasoning_effort)
     )
+    return _unpack_response(response)
 
-    response = client.chat.completions.create(
-        model=model_name,
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0.2,
-        max_tokens=max_output_tokens,
-        extra_body={
-            "reasoning": {
-                "effort": reasoning_effort,
-            }
-        },
-        response_format={
-            "type": "json_schema",
-            "json_schema": CUES_RESPONSE_JSON_SCHEMA,
-        },
+
+async def call_openrouter_async(
+    client: AsyncOpenAI,
+    model_name: str,
+    prompt: str,
+    max_output_tokens: int = 3000,
+    reasoning_effort: str = "low",
+) -> tuple[str, str | None]:
+    response = await client.chat.completions.create(
+        **_completion_kwargs(model_name, prompt, max_output_tokens, reasoning_effort)
     )
-    content = response.choices[0].message.content
-    finish_reason = response.choices[0].finish_reason
-    return (content.strip() if content else "{}"), finish_reason
+    return _unpack_response(response)
 
 
 def parse_args() -> argparse.Namespace:
@@ -112,27 +122,25 @@ def _try_parse_json_text(raw_text: str):
     if not text:
         raise ValueError("Respuesta vacia del modelo.")
 
-    try:
-        return json.loads(text)
-    except json.JSONDecodeError:
-        pass
-
+    # En el caso comun (JSON limpio) se parsea una sola vez; la recuperacion es solo el respaldo.
     if text.startswith("```"):
-        lines = text.splitlines()
-        if len(lines) >= 3 and lines[0].startswith("```") and lines[-1].strip() == "```":
-            fenced = "\n".join(lines[1:-1]).strip()
-            if fenced:
-                try:
-                    return json.loads(fenced)
-                except json.JSONDecodeError:
-                    pass
+        first_newline = text.find("\n")
+        closing_fence = text.rfind("```")
+        if first_newline != -1 and closing_fence > first_newline:
+            text = text[first_newline + 1 : closing_fence].strip()
+
+    if text[:1] in "{[" and text[-1:] in "}]":
+        try:
+            return _loads(text)
+        except json.JSONDecodeError:
+            pass
 
+    # Recuperacion: texto extra alrededor del objeto JSON (ej: "[nota] {...}").
     start = text.find("{")
     end = text.rfind("}")
-    if start != -1 and end != -1 and end > start:
-        candidate = text[start : end + 1]
+    if start != -1 and end > start:
         try:
-            return json.loads(candidate)
+            return _loads(text[start : end + 1])
         except json.JSONDecodeError:
             pass
 
@@ -143,7 +151,7 @@ def parse_cues_payload(cues_json: str) -> dict:
     payload = _try_parse_json_text(cues_json)
 
     if isinstance(payload, list):
-        cleaned = [str(item).strip() for item in payload if str(item).strip()]
+        cleaned = [text for item in payload if (text := str(item).strip())]
         if cleaned:
             return {"cues": cleaned}
 
@@ -152,7 +160,7 @@ def parse_cues_payload(cues_json: str) -> dict:
 
     cues = payload.get("cues")
     if isinstance(cues, list):
-        cleaned = [str(item).strip() for item in cues if str(item).strip()]
+        cleaned = [text for item in cues if (text := str(item).strip())]
         if cleaned:
             return {"cues": cleaned}
 
@@ -160,17 +168,15 @@ def parse_cues_payload(cues_json: str) -> dict:
     for key in alt_keys:
         alt_value = payload.get(key)
         if isinstance(alt_value, list):
-            cleaned = [str(item).strip() for item in alt_value if str(item).strip()]
+            cleaned = [text for item in alt_value if (text := str(item).strip())]
             if cleaned:
                 return {"cues": cleaned}
 
     raise ValueError("La respuesta JSON no contiene una lista en 'cues'.")
 
 def cues_json_to_lines(cues_json: str) -> str:
-    payload = parse_cues_payload(cues_json)
-    cues = payload["cues"]
-    lines = [str(item).strip() for item in cues if str(item).strip()]
-    return "\n".join(lines)
+    # parse_cues_payload ya entrega cues sin espacios y no vacios.
+    return "\n".join(parse_cues_payload(cues_json)["cues"])
 
 
 def generate_cues_with_retry(
@@ -179,32 +185,36 @@ def generate_cues_with_retry(
     prompt: str,
     max_output_tokens: int = 3000,
 ) -> tuple[str, str, int, str | None, bool, str]:
-    attempts: list[tuple[int, str]] = [(max_output_tokens, "low"), (max_output_tokens, "none")]
-    retry_tokens = min(max_output_tokens * 2, 6000)
-    if retry_tokens > max_output_tokens:
-        attempts.append((retry_tokens, "none"))
-
-    last_exc: Exception | None = None
-    for idx, (tokens, effort) in enumerate(attempts):
-        cues_json, finish_reason = call_openrouter(
+    def call(tokens: int, effort: str) -> tuple[str, str | None]:
+        return call_openrouter(
             model_name,
             api_key,
             prompt,
             max_output_tokens=tokens,
             reasoning_effort=effort,
         )
-        try:
-            cues_lines = cues_json_to_lines(cues_json)
-            return cues_json, cues_lines, tokens, finish_reason, idx > 0, effort
-        except Exception as exc:
-            last_exc = exc
-            if finish_reason == "length" and idx + 1 < len(attempts):
-                continue
-            raise
 
-    if last_exc:
-        raise last_exc
-    raise ValueError("No se pudo generar cues.")
+    return generate_with_retry(call, cues_json_to_lines, retry_attempts(max_output_tokens))
+
+
+async def generate_cues_with_retry_async(
+    client: AsyncOpenAI,
+    model_name: str,
+    prompt: str,
+    max_output_tokens: int = 3000,
+) -> tuple[str, str, int, str | None, bool, str]:
+    def call(tokens: int, effort: str):
+        return call_openrouter_async(
+            client,
+            model_name,
+            prompt,
+            max_output_tokens=tokens,
+            reasoning_effort=effort,
+        )
+
+    return await generate_with_retry_async(
+        call, cues_json_to_lines, retry_attempts(max_output_tokens)
+    )
 
 
 def main() -> int:
@@ -244,12 +254,8 @@ def main() -> int:
     response_path = default_response_path(transcript_path)
     lines_path = default_lines_path(transcript_path)
 
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-    output_path.write_text(cues_json + "\n", encoding="utf-8")
-    response_path.parent.mkdir(parents=True, exist_ok=True)
-    response_path.write_text(cues_json + "\n", encoding="utf-8")
-    lines_path.parent.mkdir(parents=True, exist_ok=True)
-    lines_path.write_text(cues_lines + "\n", encoding="utf-8")
+    write_text_files([(output_path, cues_json), (lines_path, cues_lines)])
+    link_or_write(output_path, response_path, cues_json)
 
     print(cues_json)
     print(
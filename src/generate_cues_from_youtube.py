@@ -1,9 +1,11 @@
 import argparse
+import asyncio
 import os
 import sys
 import tempfile
 from pathlib import Path
 
+from openai import AsyncOpenAI
 from youtube_transcript_api import NoTranscriptFound
 from youtube_transcript_api import TranscriptsDisabled
 from youtube_transcript_api import VideoUnavailable
@@ -12,18 +14,21 @@ from download_youtube_transcript import extract_video_id
 from download_youtube_transcript import fetch_transcript
 from download_youtube_transcript import format_with_start_time_only
 from download_youtube_transcript import parse_languages
+from env_loader import load_env_file_if_needed
 from generate_cues_from_transcript import build_prompt
-from generate_cues_from_transcript import generate_cues_with_retry
-from generate_cues_from_transcript import load_env_file_if_needed
+from generate_cues_from_transcript import generate_cues_with_retry_async
+from openrouter_client import OPENROUTER_BASE_URL
+from text_files import write_text_files
 
 
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(
-        description="Genera CUEs desde un video de YouTube (URL o ID) y responde por stdout."
+        description="Genera CUEs desde uno o mas videos de YouTube (URL o ID) y responde por stdout."
     )
     parser.add_argument(
         "video",
-        help="Video ID (11 chars) o URL de YouTube.",
+        nargs="+",
+        help="Video ID (11 chars) o URL de YouTube. Acepta varios.",
     )
     parser.add_argument(
         "-l",
@@ -31,6 +36,13 @@ def parse_args() -> argparse.Namespace:
         default="es,en",
         help='Idiomas en prioridad separados por coma (ej: "es,en").',
     )
+    parser.add_argument(
+        "-c",
+        "--concurrency",
+        type=int,
+        default=10,
+        help="Maximo de videos procesados en paralelo (por defecto: 10).",
+    )
     parser.add_argument(
         "--save-temp",
         action="store_true",
@@ -44,35 +56,42 @@ def parse_args() -> argparse.Namespace:
     return parser.parse_args()
 
 
-def main() -> int:
-    args = parse_args()
-    load_env_file_if_needed()
-
-    model_name = os.getenv("MODEL_NAME")
-    api_key = os.getenv("OPENROUTER_API_KEY")
-    if not model_name:
-        print("[ERROR] Falta MODEL_NAME en el entorno o .env", file=sys.stderr)
-        return 1
-    if not api_key:
-        print("[ERROR] Falta OPENROUTER_API_KEY en el entorno o .env", file=sys.stderr)
-        return 1
-
-    try:
-        video_id = extract_video_id(args.video)
-        languages = parse_languages(args.languages)
-        segments = fetch_transcript(video_id, languages)
+async def process_video(
+    client: AsyncOpenAI,
+    semaphore: asyncio.Semaphore,
+    model_name: str,
+    video: str,
+    languages: list[str],
+    save_temp: bool,
+) -> tuple[str, str, int, str | None, bool, str, Path | None]:
+    async with semaphore:
+        video_id = extract_video_id(video)
+        segments = await asyncio.to_thread(fetch_transcript, video_id, languages)
         transcript_ti = format_with_start_time_only(segments)
         prompt = build_prompt(transcript_ti)
-        cues_json, cues_lines, used_tokens, finish_reason, retried, used_effort = generate_cues_with_retry(
-            model_name, api_key, prompt
+        cues_json, cues_lines, used_tokens, finish_reason, retried, used_effort = (
+            await generate_cues_with_retry_async(client, model_name, prompt)
+        )
+
+    temp_dir: Path | None = None
+    if save_temp:
+        temp_dir = Path(tempfile.mkdtemp(prefix=f"youtube-cues-{video_id}-"))
+        await asyncio.to_thread(
+            write_text_files,
+            [
+                (temp_dir / "transcript_ti.txt", transcript_ti),
+                (temp_dir / "cues.json", cues_json),
+                (temp_dir / "cues.txt", cues_lines),
+            ],
         )
+    return cues_json, cues_lines, used_tokens, finish_reason, retried, used_effort, temp_dir
 
-        if args.save_temp:
-            temp_dir = Path(tempfile.mkdtemp(prefix="youtube-cues-"))
-            (temp_dir / "transcript_ti.txt").write_text(transcript_ti + "\n", encoding="utf-8")
-            (temp_dir / "cues.json").write_text(cues_json + "\n", encoding="utf-8")
-            (temp_dir / "cues.txt").write_text(cues_lines + "\n", encoding="utf-8")
-            print(f"[INFO] Archivos temporales en: {temp_dir}", file=sys.stderr)
+
+def report_result(task: asyncio.Task, as_json: bool) -> int:
+    try:
+        cues_json, cues_lines, used_tokens, finish_reason, retried, used_effort, temp_dir = (
+            task.result()
+        )
     except ValueError as exc:
         print(f"[ERROR] {exc}", file=sys.stderr)
         return 2
@@ -92,6 +111,8 @@ def main() -> int:
         print(f"[ERROR] Fallo inesperado: {exc}", file=sys.stderr)
         return 99
 
+    if temp_dir is not None:
+        print(f"[INFO] Archivos temporales en: {temp_dir}", file=sys.stderr)
     print(
         (
             f"[INFO] CUEs finish_reason: {finish_reason} "
@@ -102,12 +123,51 @@ def main() -> int:
     if retried:
         print("[INFO] CUEs reintentados por salida truncada.", file=sys.stderr)
 
-    if args.json:
+    if as_json:
         print(cues_json)
     else:
         print(cues_lines)
     return 0
 
 
+async def run(args: argparse.Namespace, model_name: str, api_key: str) -> int:
+    languages = parse_languages(args.languages)
+    semaphore = asyncio.Semaphore(max(args.concurrency, 1))
+
+    # Un solo cliente para todos los videos: reutiliza el pool de conexiones HTTP.
+    async with AsyncOpenAI(base_url=OPENROUTER_BASE_URL, api_key=api_key) as client:
+        tasks = [
+            asyncio.create_task(
+                process_video(client, semaphore, model_name, video, languages, args.save_temp)
+            )
+            for video in args.video
+        ]
+        await asyncio.wait(tasks)
+
+    exit_code = 0
+    for video, task in zip(args.video, tasks):
+        if len(args.video) > 1:
+            print(f"== {video} ==")
+        code = report_result(task, args.json)
+        exit_code = exit_code or code
+    return exit_code
+
+
+def main() -> int:
+    args = parse_args()
+    load_env_file_if_needed()
+
+    model_name = os.getenv("MODEL_NAME")
+    api_key = os.getenv("OPENROUTER_API_KEY")
+    if not model_name:
+        print("[ERROR] Falta MODEL_NAME en el entorno o .env", file=sys.stderr)
+        return 1
+    if not api_key:
+        print("[ERROR] Falta OPENROUTER_API_KEY en el entorno o .env", file=sys.stderr)
+        return 1
+
+    return asyncio.run(run(args, model_name, api_key))
+
+
 if __name__ == "__main__":
     raise SystemExit(main())
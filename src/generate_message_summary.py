@@ -1,19 +1,52 @@
 import argparse
+import asyncio
+import bisect
+import functools
 import json
 import os
 import re
 import sys
+from collections.abc import Awaitable
+from collections.abc import Callable
 from pathlib import Path
 
-from openai import OpenAI
+from openai import AsyncOpenAI
 
-from generate_cues_from_transcript import load_env_file_if_needed
+from env_loader import load_env_file_if_needed
 from message_summary_schema import SUMMARY_RESPONSE_JSON_SCHEMA
 from message_summary_schema import summary_output_schema_pretty_json
+from openrouter_client import completion_kwargs
+from openrouter_client import generate_with_retry
+from openrouter_client import generate_with_retry_async
+from openrouter_client import get_client
+from openrouter_client import retry_attempts
+from text_files import write_text_files
+
+try:
+    import orjson
+except ImportError:  # orjson es opcional; se usa json de la stdlib.
+    orjson = None
 
 PROMPT_TEMPLATE_PATH = Path(__file__).resolve().parent.parent / "prompts" / "message_summary_prompt.md"
-TIMED_LINE_REGEX = re.compile(r"^(\d{2}:\d{2}:\d{2})\|(.*)$")
-CUE_LINE_REGEX = re.compile(r"^(\d{2}:\d{2}:\d{2})\s+(.+?)\s*$")
+_DECODER = json.JSONDecoder()
+_loads = orjson.loads if orjson is not None else json.loads
+SPECULATIVE_STAGGER_SECONDS = 0.05
+STREAM_READ_TIMEOUT_SECONDS = 120.0
+TIMED_LINE_REGEX = re.compile(
+    r"^[^\S\n]*((\d{2}):(\d{2}):(\d{2}))\|(.*)$",
+    re.MULTILINE,
+)
+_NORMALIZE_TABLE = str.maketrans(
+    {
+        "á": "a",
+        "é": "e",
+        "í": "i",
+        "ó": "o",
+        "ú": "u",
+        "ü": "u",
+        "ñ": "n",
+    }
+)
 
 
 def parse_args() -> argparse.Namespace:
@@ -62,19 +95,27 @@ def parse_args() -> argparse.Namespace:
 
 
 def _normalize(text: str) -> str:
-    lowered = text.strip().lower()
-    replacements = str.maketrans(
-        {
-            "á": "a",
-            "é": "e",
-            "í": "i",
-            "ó": "o",
-            "ú": "u",
-            "ü": "u",
-            "ñ": "n",
-        }
+    return text.strip().lower().translate(_NORMALIZE_TABLE)
+
+
+# Secciones tipicas posteriores al mensaje, ya normalizadas.
+POST_MESSAGE_KEYS = tuple(
+    dict.fromkeys(
+        _normalize(label)
+        for label in (
+            "ministracion",
+            "ministración",
+            "oracion",
+            "oración",
+            "cumpleanos",
+            "cumpleaños",
+            "despedida",
+            "cierre",
+            "bendicion",
+            "bendición",
+        )
     )
-    return lowered.translate(replacements)
+)
 
 
 def _hms_to_seconds(hms: str) -> int:
@@ -89,14 +130,28 @@ def _seconds_to_hms(seconds: int) -> str:
     return f"{hh:02}:{mm:02}:{ss:02}"
 
 
-def _parse_cues(cues_text: str) -> list[tuple[int, str]]:
-    cues: list[tuple[int, str]] = []
+def _parse_cue_line(line: str) -> tuple[str, str] | None:
+    """Split a "HH:MM:SS Titulo" line into (hms, title) using fixed positions."""
+    line = line.strip()
+    if len(line) < 10 or line[2] != ":" or line[5] != ":" or not line[8].isspace():
+        return None
+    if not (line[0:2].isdecimal() and line[3:5].isdecimal() and line[6:8].isdecimal()):
+        return None
+    title = line[9:].strip()
+    if not title:
+        return None
+    return line[:8], title
+
+
+def _parse_cues(cues_text: str) -> list[tuple[int, str, str]]:
+    """Return (seconds, title, normalized_title) for each valid cue line."""
+    cues: list[tuple[int, str, str]] = []
     for line in cues_text.splitlines():
-        match = CUE_LINE_REGEX.match(line.strip())
-        if not match:
+        parsed = _parse_cue_line(line)
+        if parsed is None:
             continue
-        hms, title = match.groups()
-        cues.append((_hms_to_seconds(hms), title))
+        hms, title = parsed
+        cues.append((_hms_to_seconds(hms), title, _normalize(title)))
     return cues
 
 
@@ -108,8 +163,8 @@ def find_time_range(cues_text: str, start_label: str, end_label: str) -> tuple[i
         raise ValueError("No pude parsear cues validos (formato esperado: HH:MM:SS Titulo).")
 
     start_index: int | None = None
-    for idx, (_, title) in enumerate(cues):
-        if start_key in _normalize(title):
+    for idx, (_, _, normalized_title) in enumerate(cues):
+        if start_key in normalized_title:
             start_index = idx
             break
 
@@ -117,45 +172,45 @@ def find_time_range(cues_text: str, start_label: str, end_label: str) -> tuple[i
         raise ValueError(f"No encontre un cue de inicio con etiqueta: '{start_label}'.")
     start_time = cues[start_index][0]
 
-    for seconds, title in cues[start_index + 1 :]:
-        if end_key in _normalize(title) and seconds > start_time:
+    for seconds, _, normalized_title in cues[start_index + 1 :]:
+        if end_key in normalized_title and seconds > start_time:
             return start_time, seconds, "end_label"
 
     # Fallback 1: buscar secciones tipicas posteriores al mensaje.
-    post_message_labels = (
-        "ministracion",
-        "ministración",
-        "oracion",
-        "oración",
-        "cumpleanos",
-        "cumpleaños",
-        "despedida",
-        "cierre",
-        "bendicion",
-        "bendición",
-    )
-    for seconds, title in cues[start_index + 1 :]:
-        normalized_title = _normalize(title)
-        if any(_normalize(label) in normalized_title for label in post_message_labels):
+    for seconds, _, normalized_title in cues[start_index + 1 :]:
+        if any(label in normalized_title for label in POST_MESSAGE_KEYS):
             return start_time, seconds, "post_message_label"
 
     # Fallback 2: resumir hasta fin de transcript.
     return start_time, None, "end_of_transcript"
 
 
+def _timed_match_seconds(match: re.Match) -> int:
+    _, hh, mm, ss, _ = match.groups()
+    return int(hh) * 3600 + int(mm) * 60 + int(ss)
+
+
+def _range_start_offset(transcript_text: str, start_time: int) -> int:
+    """Return the offset of the first timed line at or after start_time (binary search)."""
+
+    def reached(offset: int) -> bool:
+        match = TIMED_LINE_REGEX.search(transcript_text, offset)
+        return match is None or _timed_match_seconds(match) >= start_time
+
+    return bisect.bisect_left(range(len(transcript_text) + 1), True, key=reached)
+
+
 def extract_transcript_range(transcript_text: str, start_time: int, end_time: int | None) -> str:
     lines_in_range: list[str] = []
-    for line in transcript_text.splitlines():
-        match = TIMED_LINE_REGEX.match(line.strip())
-        if not match:
-            continue
-        hms, text = match.groups()
-        seconds = _hms_to_seconds(hms)
-        in_range = start_time <= seconds if end_time is None else start_time <= seconds < end_time
-        if in_range:
-            cleaned = text.strip()
-            if cleaned:
-                lines_in_range.append(f"{hms}|{cleaned}")
+    # El transcript viene ordenado por tiempo: se salta al inicio del rango y se corta al final.
+    offset = _range_start_offset(transcript_text, start_time)
+    for match in TIMED_LINE_REGEX.finditer(transcript_text, offset):
+        seconds = _timed_match_seconds(match)
+        if end_time is not None and seconds >= end_time:
+            break
+        cleaned = match.group(5).strip()
+        if cleaned:
+            lines_in_range.append(f"{match.group(1)}|{cleaned}")
 
     if not lines_in_range:
         raise ValueError(
@@ -164,15 +219,51 @@ def extract_transcript_range(transcript_text: str, start_time: int, end_time: in
     return "\n".join(lines_in_range)
 
 
-def build_prompt(segment_text: str) -> str:
+@functools.lru_cache(maxsize=1)
+def _load_template() -> str:
     try:
-        template = PROMPT_TEMPLATE_PATH.read_text(encoding="utf-8")
+        return PROMPT_TEMPLATE_PATH.read_text(encoding="utf-8")
     except FileNotFoundError as exc:
         raise ValueError(f"No se encontro el template de prompt: {PROMPT_TEMPLATE_PATH}") from exc
-    return (
-        template.replace("<SUMMARY_JSON_SCHEMA>", summary_output_schema_pretty_json())
-        .replace("<TRANSCRIPCION_MENSAJE>", segment_text)
-    )
+
+
+@functools.lru_cache(maxsize=1)
+def _template_parts() -> tuple[str, ...]:
+    # El schema se inserta una sola vez; el template queda partido en el marcador del mensaje.
+    template = _load_template().replace("<SUMMARY_JSON_SCHEMA>", summary_output_schema_pretty_json())
+    return tuple(template.split("<TRANSCRIPCION_MENSAJE>"))
+
+
+def build_prompt(segment_text: str) -> str:
+    return segment_text.join(_template_parts())
+
+
+def _completion_kwargs(
+    model_name: str,
+    prompt: str,
+    max_output_tokens: int,
+    reasoning_effort: str,
+) -> dict:
+    return {
+        **completion_kwargs(
+            model_name, prompt, max_output_tokens, reasoning_effort, SUMMARY_RESPONSE_JSON_SCHEMA
+        ),
+        # En streaming el timeout de lectura aplica entre chunks: un stream trabado falla rapido.
+        "stream": True,
+        "timeout": STREAM_READ_TIMEOUT_SECONDS,
+    }
+
+
+def _chunk_delta(chunk) -> tuple[str | None, str | None]:
+    if not chunk.choices:
+        return None, None
+    choice = chunk.choices[0]
+    return choice.delta.content, choice.finish_reason
+
+
+def _join_stream_content(parts: list[str], finish_reason: str | None) -> tuple[str, str | None]:
+    content = "".join(parts)
+    return (content.strip() if content else "{}"), finish_reason
 
 
 def call_openrouter(
@@ -182,29 +273,43 @@ def call_openrouter(
     max_output_tokens: int = 6000,
     reasoning_effort: str = "low",
 ) -> tuple[str, str | None]:
-    client = OpenAI(
-        base_url="https://openrouter.ai/api/v1",
-        api_key=api_key,
+    client = get_client(api_key)
+    stream = client.chat.completions.create(
+        **_completion_kwargs(model_name, prompt, max_output_tokens, reasoning_effort)
     )
-
-    response = client.chat.completions.create(
-        model=model_name,
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0.2,
-        max_tokens=max_output_tokens,
-        extra_body={
-            "reasoning": {
-                "effort": reasoning_effort,
-            }
-        },
-        response_format={
-            "type": "json_schema",
-            "json_schema": SUMMARY_RESPONSE_JSON_SCHEMA,
-        },
+    parts: list[str] = []
+    finish_reason: str | None = None
+    with stream:
+        for chunk in stream:
+            content, chunk_finish_reason = _chunk_delta(chunk)
+            if content:
+                parts.append(content)
+            if chunk_finish_reason:
+                finish_reason = chunk_finish_reason
+    return _join_stream_content(parts, finish_reason)
+
+
+async def call_openrouter_async(
+    client: AsyncOpenAI,
+    model_name: str,
+    prompt: str,
+    max_output_tokens: int = 6000,
+    reasoning_effort: str = "low",
+) -> tuple[str, str | None]:
+    stream = await client.chat.completions.create(
+        **_completion_kwargs(model_name, prompt, max_output_tokens, reasoning_effort)
     )
-    content = response.choices[0].message.content
-    finish_reason = response.choices[0].finish_reason
-    return (content.strip() if content else "{}"), finish_reason
+    parts: list[str] = []
+    finish_reason: str | None = None
+    # async with cierra la conexion si la tarea se cancela (intentos especulativos).
+    async with stream:
+        async for chunk in stream:
+            content, chunk_finish_reason = _chunk_delta(chunk)
+            if content:
+                parts.append(content)
+            if chunk_finish_reason:
+                finish_reason = chunk_finish_reason
+    return _join_stream_content(parts, finish_reason)
 
 
 def _try_parse_json_text(raw_text: str):
@@ -212,55 +317,62 @@ def _try_parse_json_text(raw_text: str):
     if not text:
         raise ValueError("Respuesta vacia del modelo.")
 
-    try:
-        return json.loads(text)
-    except json.JSONDecodeError:
-        pass
-
     if text.startswith("```"):
-        lines = text.splitlines()
-        if len(lines) >= 3 and lines[0].startswith("```") and lines[-1].strip() == "```":
-            fenced = "\n".join(lines[1:-1]).strip()
-            if fenced:
-                try:
-                    return json.loads(fenced)
-                except json.JSONDecodeError:
-                    pass
+        first_newline = text.find("\n")
+        closing_fence = text.rfind("```")
+        if first_newline != -1 and closing_fence > first_newline:
+            text = text[first_newline + 1 : closing_fence].strip()
 
+    # raw_decode parsea desde el primer objeto en una sola pasada e ignora texto posterior.
+    if text[:1] in "{[":
+        try:
+            payload, _ = _DECODER.raw_decode(text)
+            return payload
+        except json.JSONDecodeError:
+            pass
+
+    # Recuperacion: texto extra antes del objeto JSON (ej: "[nota] {...}").
     start = text.find("{")
-    end = text.rfind("}")
-    if start != -1 and end != -1 and end > start:
-        candidate = text[start : end + 1]
+    if start != -1:
         try:
-            return json.loads(candidate)
+            payload, _ = _DECODER.raw_decode(text, start)
+            return payload
         except json.JSONDecodeError:
             pass
 
     raise ValueError("No pude parsear JSON valido desde la respuesta del modelo.")
 
 
+def _parse_strict_schema_json(text: str):
+    # Con response_format json_schema (strict) la respuesta normalmente ya es JSON limpio.
+    return _loads(text)
+
+
 def parse_summary_payload(summary_json: str) -> dict:
-    payload = _try_parse_json_text(summary_json)
+    try:
+        payload = _parse_strict_schema_json(summary_json)
+    except json.JSONDecodeError:
+        payload = _try_parse_json_text(summary_json)
 
-    if isinstance(payload, list):
-        points = [str(item).strip() for item in payload if str(item).strip()]
+    if isinstance(payload, dict):
+        points = payload.get("summary_points")
+        if isinstance(points, list):
+            cleaned = [text for item in points if (text := str(item).strip())]
+            if cleaned:
+                return {"summary_points": cleaned}
+    elif isinstance(payload, list):
+        points = [text for item in payload if (text := str(item).strip())]
         if points:
             return {"summary_points": points}
 
     if not isinstance(payload, dict):
         raise ValueError("La respuesta no es un objeto JSON valido para resumen.")
 
-    points = payload.get("summary_points")
-    if isinstance(points, list):
-        cleaned = [str(item).strip() for item in points if str(item).strip()]
-        if cleaned:
-            return {"summary_points": cleaned}
-
     alt_keys = ("points", "resumen", "summary", "bullets", "cues")
     for key in alt_keys:
         alt_value = payload.get(key)
         if isinstance(alt_value, list):
-            cleaned = [str(item).strip() for item in alt_value if str(item).strip()]
+            cleaned = [text for item in alt_value if (text := str(item).strip())]
             if cleaned:
                 return {"summary_points": cleaned}
 
@@ -278,32 +390,164 @@ def generate_summary_with_retry(
     prompt: str,
     max_output_tokens: int,
 ) -> tuple[str, str, int, str | None, bool, str]:
-    attempts: list[tuple[int, str]] = [(max_output_tokens, "low"), (max_output_tokens, "none")]
-    retry_tokens = min(max_output_tokens * 2, 6000)
-    if retry_tokens > max_output_tokens:
-        attempts.append((retry_tokens, "none"))
-
-    last_exc: Exception | None = None
-    for idx, (tokens, effort) in enumerate(attempts):
-        summary_json, finish_reason = call_openrouter(
+    def call(tokens: int, effort: str) -> tuple[str, str | None]:
+        return call_openrouter(
             model_name,
             api_key,
             prompt,
             max_output_tokens=tokens,
             reasoning_effort=effort,
         )
-        try:
-            summary_lines = summary_json_to_lines(summary_json)
-            return summary_json, summary_lines, tokens, finish_reason, idx > 0, effort
-        except Exception as exc:
-            last_exc = exc
-            if finish_reason == "length" and idx + 1 < len(attempts):
-                continue
-            raise
 
-    if last_exc:
-        raise last_exc
-    raise ValueError("No se pudo generar el resumen.")
+    return generate_with_retry(call, summary_json_to_lines, retry_attempts(max_output_tokens))
+
+
+async def _call_after(
+    delay: float,
+    call: Callable[[int, str], Awaitable[tuple[str, str | None]]],
+    tokens: int,
+    effort: str,
+) -> tuple[str, str | None]:
+    if delay:
+        await asyncio.sleep(delay)
+    return await call(tokens, effort)
+
+
+async def _race_summary_attempts(
+    call: Callable[[int, str], Awaitable[tuple[str, str | None]]],
+    attempts: list[tuple[int, str]],
+) -> tuple[tuple[str, str, int, str | None, bool, str] | None, list[tuple[Exception, str | None]]]:
+    """Run attempts concurrently (staggered) and return the first parseable summary.
+
+    An attempt that raises or does not parse does not stop the others. When none
+    succeeds, the (error, finish_reason) failures are returned in attempt order.
+    """
+    tasks = {
+        asyncio.create_task(
+            _call_after(idx * SPECULATIVE_STAGGER_SECONDS, call, tokens, effort)
+        ): idx
+        for idx, (tokens, effort) in enumerate(attempts)
+    }
+    failures: dict[int, tuple[Exception, str | None]] = {}
+    try:
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in sorted(done, key=tasks.__getitem__):
+                idx = tasks[task]
+                tokens, effort = attempts[idx]
+                try:
+                    summary_json, finish_reason = task.result()
+                except Exception as exc:
+                    failures[idx] = (exc, None)
+                    continue
+                try:
+                    summary_lines = summary_json_to_lines(summary_json)
+                except Exception as exc:
+                    failures[idx] = (exc, finish_reason)
+                    continue
+                # Solo es reintento si un intento anterior ya fallo por salida truncada.
+                retried = any(
+                    failures[prev][1] == "length" for prev in range(idx) if prev in failures
+                )
+                return (summary_json, summary_lines, tokens, finish_reason, retried, effort), []
+    finally:
+        for task in tasks:
+            task.cancel()
+        # Se esperan las tareas canceladas para que cierren sus streams antes de volver.
+        await asyncio.gather(*tasks, return_exceptions=True)
+    return None, [failures[idx] for idx in sorted(failures)]
+
+
+async def generate_summary_with_retry_async(
+    client: AsyncOpenAI,
+    model_name: str,
+    prompt: str,
+    max_output_tokens: int,
+    speculative: bool = False,
+) -> tuple[str, str, int, str | None, bool, str]:
+    attempts = retry_attempts(max_output_tokens)
+
+    def call(tokens: int, effort: str):
+        return call_openrouter_async(
+            client,
+            model_name,
+            prompt,
+            max_output_tokens=tokens,
+            reasoning_effort=effort,
+        )
+
+    if not speculative:
+        return await generate_with_retry_async(call, summary_json_to_lines, attempts)
+
+    # Los dos primeros intentos (effort low/none) corren en paralelo y gana el primero valido.
+    result, failures = await _race_summary_attempts(call, attempts[:2])
+    if result is not None:
+        return result
+    for exc, finish_reason in failures:
+        if finish_reason != "length" or len(attempts) <= 2:
+            raise exc
+    return await generate_with_retry_async(
+        call, summary_json_to_lines, attempts[2:], retried=True
+    )
+
+
+def log_range_info(
+    start_time: int,
+    end_time: int | None,
+    range_source: str,
+    start_label: str,
+    end_label: str,
+) -> None:
+    if end_time is None:
+        print(
+            f"[INFO] Rango usado: {_seconds_to_hms(start_time)} -> FIN TRANSCRIPT",
+            file=sys.stderr,
+        )
+    else:
+        print(
+            f"[INFO] Rango usado: {_seconds_to_hms(start_time)} -> {_seconds_to_hms(end_time)}",
+            file=sys.stderr,
+        )
+    if range_source == "post_message_label":
+        print(
+            (
+                f"[INFO] No se encontro '{end_label}' despues de '{start_label}'. "
+                "Se uso una seccion posterior detectada por nombre."
+            ),
+            file=sys.stderr,
+        )
+    elif range_source == "end_of_transcript":
+        print(
+            (
+                f"[INFO] No se encontro '{end_label}' ni una seccion posterior "
+                f"despues de '{start_label}'. Se uso fin de transcript."
+            ),
+            file=sys.stderr,
+        )
+
+
+def log_summary_finish_info(
+    finish_reason: str | None,
+    used_tokens: int,
+    used_effort: str,
+    retried: bool,
+) -> None:
+    print(
+        (
+            f"[INFO] Resumen finish_reason: {finish_reason} "
+            f"(max_output_tokens usado: {used_tokens}, reasoning.effort: {used_effort})"
+        ),
+        file=sys.stderr,
+    )
+    if retried:
+        print(
+            (
+                f"[INFO] Se reintento por salida truncada. max_output_tokens usado: {used_tokens} "
+                f"(finish_reason final: {finish_reason})."
+            ),
+            file=sys.stderr,
+        )
 
 
 def default_output_path(transcript_path: Path) -> Path:
@@ -344,8 +588,9 @@ def main() -> int:
         return 3
 
     try:
-        transcript_text = transcript_path.read_text(encoding="utf-8")
-        cues_text = cues_path.read_text(encoding="utf-8")
+        # Sin traduccion de saltos de linea: el regex y splitlines ya toleran "\r\n".
+        transcript_text = transcript_path.read_bytes().decode("utf-8")
+        cues_text = cues_path.read_bytes().decode("utf-8")
         start_time, end_time, range_source = find_time_range(
             cues_text, args.start_label, args.end_label
         )
@@ -370,53 +615,12 @@ def main() -> int:
     output_path = Path(args.output) if args.output else default_output_path(transcript_path)
     response_path = default_response_path(transcript_path)
 
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-    output_path.write_text(summary_lines + "\n", encoding="utf-8")
-    response_path.parent.mkdir(parents=True, exist_ok=True)
-    response_path.write_text(summary_json + "\n", encoding="utf-8")
+    write_text_files([(output_path, summary_lines), (response_path, summary_json)])
 
     print(summary_lines)
-    if end_time is None:
-        print(
-            f"\n[INFO] Rango usado: {_seconds_to_hms(start_time)} -> FIN TRANSCRIPT",
-            file=sys.stderr,
-        )
-    else:
-        print(
-            f"\n[INFO] Rango usado: {_seconds_to_hms(start_time)} -> {_seconds_to_hms(end_time)}",
-            file=sys.stderr,
-        )
-    if range_source == "post_message_label":
-        print(
-            (
-                f"[INFO] No se encontro '{args.end_label}' despues de '{args.start_label}'. "
-                "Se uso una seccion posterior detectada por nombre."
-            ),
-            file=sys.stderr,
-        )
-    elif range_source == "end_of_transcript":
-        print(
-            (
-                f"[INFO] No se encontro '{args.end_label}' ni una seccion posterior "
-                f"despues de '{args.start_label}'. Se uso fin de transcript."
-            ),
-            file=sys.stderr,
-        )
-    print(
-        (
-            f"[INFO] Resumen finish_reason: {finish_reason} "
-            f"(max_output_tokens usado: {used_tokens}, reasoning.effort: {used_effort})"
-        ),
-        file=sys.stderr,
-    )
-    if retried:
-        print(
-            (
-                f"[INFO] Se reintento por salida truncada. max_output_tokens usado: {used_tokens} "
-                f"(finish_reason final: {finish_reason})."
-            ),
-            file=sys.stderr,
-        )
+    print(file=sys.stderr)
+    log_range_info(start_time, end_time, range_source, args.start_label, args.end_label)
+    log_summary_finish_info(finish_reason, used_tokens, used_effort, retried)
     print(f"[INFO] Resumen guardado en: {output_path}", file=sys.stderr)
     print(f"[INFO] Respuesta JSON guardada en: {response_path}", file=sys.stderr)
     return 0
@@ -1,10 +1,12 @@
 import argparse
+import asyncio
 import json
 import os
 import sys
 import tempfile
 from pathlib import Path
 
+from openai import AsyncOpenAI
 from youtube_transcript_api import NoTranscriptFound
 from youtube_transcript_api import TranscriptsDisabled
 from youtube_transcript_api import VideoUnavailable
@@ -13,15 +15,19 @@ from download_youtube_transcript import extract_video_id
 from download_youtube_transcript import fetch_transcript
 from download_youtube_transcript import format_with_start_time_only
 from download_youtube_transcript import parse_languages
+from env_loader import load_env_file_if_needed
 from generate_cues_from_transcript import build_prompt as build_cues_prompt
-from generate_cues_from_transcript import generate_cues_with_retry
-from generate_cues_from_transcript import load_env_file_if_needed
+from generate_cues_from_transcript import generate_cues_with_retry_async
 from generate_message_summary import _seconds_to_hms
 from generate_message_summary import build_prompt as build_summary_prompt
 from generate_message_summary import extract_transcript_range
 from generate_message_summary import find_time_range
-from generate_message_summary import generate_summary_with_retry
+from generate_message_summary import generate_summary_with_retry_async
+from generate_message_summary import log_range_info
+from generate_message_summary import log_summary_finish_info
 from generate_message_summary import parse_summary_payload
+from openrouter_client import OPENROUTER_BASE_URL
+from text_files import write_text_files
 
 
 def parse_args() -> argparse.Namespace:
@@ -67,6 +73,14 @@ def parse_args() -> argparse.Namespace:
         default=6000,
         help="Maximo de tokens de salida para el resumen (por defecto: 6000).",
     )
+    parser.add_argument(
+        "--speculative",
+        action="store_true",
+        help=(
+            "Lanza en paralelo los dos primeros intentos del resumen y usa el primero valido "
+            "(menos latencia en reintentos, pero puede duplicar el costo de API)."
+        ),
+    )
     parser.add_argument(
         "--show-raw",
         action="store_true",
@@ -75,9 +89,7 @@ def parse_args() -> argparse.Namespace:
     return parser.parse_args()
 
 
-def main() -> int:
-    args = parse_args()
-    load_env_file_if_needed()
+async def run(args: argparse.Namespace, model_name: str, api_key: str) -> int:
     cues_json = ""
     summary_json = ""
     cues_used_tokens = 3000
@@ -89,24 +101,17 @@ def main() -> int:
     retried = False
     used_effort = "low"
 
-    model_name = os.getenv("MODEL_NAME")
-    api_key = os.getenv("OPENROUTER_API_KEY")
-    if not model_name:
-        print("[ERROR] Falta MODEL_NAME en el entorno o .env", file=sys.stderr)
-        return 1
-    if not api_key:
-        print("[ERROR] Falta OPENROUTER_API_KEY en el entorno o .env", file=sys.stderr)
-        return 1
-
+    # Un solo cliente async para las llamadas de cues y resumen (reutiliza conexiones).
+    client = AsyncOpenAI(base_url=OPENROUTER_BASE_URL, api_key=api_key)
     try:
         video_id = extract_video_id(args.video)
         languages = parse_languages(args.languages)
-        segments = fetch_transcript(video_id, languages)
+        segments = await asyncio.to_thread(fetch_transcript, video_id, languages)
         transcript_ti = format_with_start_time_only(segments)
 
         cues_prompt = build_cues_prompt(transcript_ti)
         cues_json, cues_lines, cues_used_tokens, cues_finish_reason, cues_retried, cues_used_effort = (
-            generate_cues_with_retry(model_name, api_key, cues_prompt)
+            await generate_cues_with_retry_async(client, model_name, cues_prompt)
         )
 
         start_time, end_time, range_source = find_time_range(
@@ -115,11 +120,14 @@ def main() -> int:
         message_segment = extract_transcript_range(transcript_ti, start_time, end_time)
 
         summary_prompt = build_summary_prompt(message_segment)
-        summary_json, summary_lines, used_tokens, finish_reason, retried, used_effort = generate_summary_with_retry(
-            model_name,
-            api_key,
-            summary_prompt,
-            max_output_tokens=args.max_output_tokens,
+        summary_json, summary_lines, used_tokens, finish_reason, retried, used_effort = (
+            await generate_summary_with_retry_async(
+                client,
+                model_name,
+                summary_prompt,
+                max_output_tokens=args.max_output_tokens,
+                speculative=args.speculative,
+            )
         )
 
         if args.show_raw:
@@ -130,11 +138,16 @@ def main() -> int:
 
         if args.save_temp:
             temp_dir = Path(tempfile.mkdtemp(prefix="youtube-message-summary-"))
-            (temp_dir / "transcript_ti.txt").write_text(transcript_ti + "\n", encoding="utf-8")
-            (temp_dir / "cues.json").write_text(cues_json + "\n", encoding="utf-8")
-            (temp_dir / "cues.txt").write_text(cues_lines + "\n", encoding="utf-8")
-            (temp_dir / "summary.json").write_text(summary_json + "\n", encoding="utf-8")
-            (temp_dir / "summary.txt").write_text(summary_lines + "\n", encoding="utf-8")
+            await asyncio.to_thread(
+                write_text_files,
+                [
+                    (temp_dir / "transcript_ti.txt", transcript_ti),
+                    (temp_dir / "cues.json", cues_json),
+                    (temp_dir / "cues.txt", cues_lines),
+                    (temp_dir / "summary.json", summary_json),
+                    (temp_dir / "summary.txt", summary_lines),
+                ],
+            )
             print(f"[INFO] Archivos temporales en: {temp_dir}", file=sys.stderr)
     except ValueError as exc:
         if ("summary_points" in str(exc) or "JSON" in str(exc)) and summary_json:
@@ -160,33 +173,10 @@ def main() -> int:
     except Exception as exc:
         print(f"[ERROR] Fallo inesperado: {exc}", file=sys.stderr)
         return 99
+    finally:
+        await client.close()
 
-    if end_time is None:
-        print(
-            f"[INFO] Rango usado: {_seconds_to_hms(start_time)} -> FIN TRANSCRIPT",
-            file=sys.stderr,
-        )
-    else:
-        print(
-            f"[INFO] Rango usado: {_seconds_to_hms(start_time)} -> {_seconds_to_hms(end_time)}",
-            file=sys.stderr,
-        )
-    if range_source == "post_message_label":
-        print(
-            (
-                f"[INFO] No se encontro '{args.end_label}' despues de '{args.start_label}'. "
-                "Se uso una seccion posterior detectada por nombre."
-            ),
-            file=sys.stderr,
-        )
-    elif range_source == "end_of_transcript":
-        print(
-            (
-                f"[INFO] No se encontro '{args.end_label}' ni una seccion posterior "
-                f"despues de '{args.start_label}'. Se uso fin de transcript."
-            ),
-            file=sys.stderr,
-        )
+    log_range_info(start_time, end_time, range_source, args.start_label, args.end_label)
     print(
         (
             f"[INFO] CUEs finish_reason: {cues_finish_reason} "
@@ -196,21 +186,7 @@ def main() -> int:
     )
     if cues_retried:
         print("[INFO] CUEs reintentados por salida truncada.", file=sys.stderr)
-    print(
-        (
-            f"[INFO] Resumen finish_reason: {finish_reason} "
-            f"(max_output_tokens usado: {used_tokens}, reasoning.effort: {used_effort})"
-        ),
-        file=sys.stderr,
-    )
-    if retried:
-        print(
-            (
-                f"[INFO] Se reintento por salida truncada. max_output_tokens usado: {used_tokens} "
-                f"(finish_reason final: {finish_reason})."
-            ),
-            file=sys.stderr,
-        )
+    log_summary_finish_info(finish_reason, used_tokens, used_effort, retried)
 
     if args.json:
         payload = parse_summary_payload(summary_json)
@@ -225,5 +201,21 @@ def main() -> int:
     return 0
 
 
+def main() -> int:
+    args = parse_args()
+    load_env_file_if_needed()
+
+    model_name = os.getenv("MODEL_NAME")
+    api_key = os.getenv("OPENROUTER_API_KEY")
+    if not model_name:
+        print("[ERROR] Falta MODEL_NAME en el entorno o .env", file=sys.stderr)
+        return 1
+    if not api_key:
+        print("[ERROR] Falta OPENROUTER_API_KEY en el entorno o .env", file=sys.stderr)
+        return 1
+
+    return asyncio.run(run(args, model_name, api_key))
+
+
 if __name__ == "__main__":
     raise SystemExit(main())
@@ -19,5 +19,8 @@ SUMMARY_RESPONSE_JSON_SCHEMA = {
 }
 
 
+_SUMMARY_SCHEMA_PRETTY = json.dumps(SUMMARY_OUTPUT_SCHEMA, ensure_ascii=False, indent=2)
+
+
 def summary_output_schema_pretty_json() -> str:
-    return json.dumps(SUMMARY_OUTPUT_SCHEMA, ensure_ascii=False, indent=2)
+    return _SUMMARY_SCHEMA_PRETTY
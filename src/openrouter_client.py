@@ -0,0 +1,101 @@
+import functools
+from collections.abc import Awaitable
+from collections.abc import Callable
+
+from openai import OpenAI
+
+OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1"
+
+
+@functools.lru_cache(maxsize=4)
+def get_client(api_key: str) -> OpenAI:
+    return OpenAI(
+        base_url=OPENROUTER_BASE_URL,
+        api_key=api_key,
+    )
+
+
+def completion_kwargs(
+    model_name: str,
+    prompt: str,
+    max_output_tokens: int,
+    reasoning_effort: str,
+    json_schema: dict,
+) -> dict:
+    return {
+        "model": model_name,
+        "messages": [{"role": "user", "content": prompt}],
+        "temperature": 0.2,
+        "max_tokens": max_output_tokens,
+        "extra_body": {
+            "reasoning": {
+                "effort": reasoning_effort,
+            }
+        },
+        "response_format": {
+            "type": "json_schema",
+            "json_schema": json_schema,
+        },
+    }
+
+
+def retry_attempts(max_output_tokens: int) -> list[tuple[int, str]]:
+    attempts: list[tuple[int, str]] = [(max_output_tokens, "low"), (max_output_tokens, "none")]
+    retry_tokens = min(max_output_tokens * 2, 6000)
+    if retry_tokens > max_output_tokens:
+        attempts.append((retry_tokens, "none"))
+    return attempts
+
+
+def _retry_or_raise(
+    exc: Exception,
+    finish_reason: str | None,
+    idx: int,
+    attempts: list[tuple[int, str]],
+) -> Exception:
+    # Solo se reintenta si la salida vino truncada y quedan intentos; si no, se propaga el error.
+    if finish_reason == "length" and idx + 1 < len(attempts):
+        return exc
+    raise exc
+
+
+def generate_with_retry(
+    call: Callable[[int, str], tuple[str, str | None]],
+    to_lines: Callable[[str], str],
+    attempts: list[tuple[int, str]],
+    retried: bool = False,
+) -> tuple[str, str, int, str | None, bool, str]:
+    """Call the model with each (tokens, effort) attempt until to_lines accepts the response."""
+    last_exc: Exception | None = None
+    for idx, (tokens, effort) in enumerate(attempts):
+        response_json, finish_reason = call(tokens, effort)
+        try:
+            lines = to_lines(response_json)
+            return response_json, lines, tokens, finish_reason, retried or idx > 0, effort
+        except Exception as exc:
+            last_exc = _retry_or_raise(exc, finish_reason, idx, attempts)
+
+    if last_exc:
+        raise last_exc
+    raise ValueError("No se pudo generar una respuesta valida.")
+
+
+async def generate_with_retry_async(
+    call: Callable[[int, str], Awaitable[tuple[str, str | None]]],
+    to_lines: Callable[[str], str],
+    attempts: list[tuple[int, str]],
+    retried: bool = False,
+) -> tuple[str, str, int, str | None, bool, str]:
+    """Async twin of generate_with_retry: same attempts and retry rule."""
+    last_exc: Exception | None = None
+    for idx, (tokens, effort) in enumerate(attempts):
+        response_json, finish_reason = await call(tokens, effort)
+        try:
+            lines = to_lines(response_json)
+            return response_json, lines, tokens, finish_reason, retried or idx > 0, effort
+        except Exception as exc:
+            last_exc = _retry_or_raise(exc, finish_reason, idx, attempts)
+
+    if last_exc:
+        raise last_exc
+    raise ValueError("No se pudo generar una respuesta valida.")
@@ -0,0 +1,29 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+
+def write_text_line(path: Path, text: str) -> None:
+    # Escribe text + "\n" sin armar una copia concatenada del texto completo.
+    with path.open("w", encoding="utf-8") as output_file:
+        output_file.write(text)
+        output_file.write("\n")
+
+
+def write_text_files(files: list[tuple[Path, str]]) -> None:
+    """Write each (path, text) pair plus a trailing newline, in parallel threads."""
+    for parent in {path.parent for path, _ in files}:
+        parent.mkdir(parents=True, exist_ok=True)
+    with ThreadPoolExecutor(max_workers=max(len(files), 1)) as executor:
+        futures = [executor.submit(write_text_line, path, text) for path, text in files]
+        for future in futures:
+            future.result()
+
+
+def link_or_write(source_path: Path, target_path: Path, text: str) -> None:
+    # Mismo contenido que source_path: enlazar en vez de escribir dos veces.
+    try:
+        target_path.unlink(missing_ok=True)
+        os.link(source_path, target_path)
+    except OSError:
+        write_text_line(target_path, text)